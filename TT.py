@@ -1,7 +1,12 @@
 import os
+import asyncio
 import re
+import pickle
+import hashlib
+import functools
+import traceback
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from telegram import Update
 from telegram.ext import (
     ApplicationBuilder,
@@ -17,60 +22,147 @@ TOKEN = os.environ.get("TOKEN")
 if not TOKEN:
     raise ValueError("TOKEN environment variable not set.")
 
-EXCEL_FILE = "TimeTable.xlsx"
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EXCEL_FILE = os.path.join(BASE_DIR, "TimeTable.xlsx")
+CACHE_DIR = os.path.join(BASE_DIR, ".cache")
+# Bump when the shape of load_schedule()'s result changes so stale pickles are ignored.
+CACHE_VERSION = 2
+
+# Day keyword and section of a well-formed request, e.g. "today s3".
+# The section is the first "s<digit>" in the second word, so "s9s3" is rejected.
+MESSAGE_RE = re.compile(r"(today|tomorrow)\s+(?:[^\ss]|s(?!\d))*s([1-6])\S*")
+ENTRY_RE = re.compile(r"([A-Z]+)\(S?([1-6])\)")
 
 # ───────────────────────── LOAD TIMETABLE ─────────────────────────
 
+def disk_cached(loader):
+    # Pickle the parsed result next to the bot, keyed on the xlsx contents + mtime.
+    # Set NO_CACHE=1 to always re-parse the Excel file.
+    @functools.wraps(loader)
+    def wrapper():
+        if os.environ.get("NO_CACHE"):
+            return loader()
+
+        with open(EXCEL_FILE, "rb") as f:
+            digest = hashlib.blake2b(f.read(), digest_size=16)
+        digest.update(f"{os.path.getmtime(EXCEL_FILE)}:{CACHE_VERSION}".encode())
+        cache_path = os.path.join(CACHE_DIR, f"{digest.hexdigest()}.pkl")
+
+        # Any unreadable cache file is just a miss; the Excel file gets re-parsed
+        try:
+            with open(cache_path, "rb") as f:
+                return pickle.load(f)
+        except Exception:
+            pass
+
+        result = loader()
+
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp_path = f"{cache_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"Could not write timetable cache: {e}")
+
+        return result
+
+    return wrapper
+
 def load_timetable():
-    df = pd.read_excel(EXCEL_FILE, header=None)
+    try:
+        df = pd.read_excel(EXCEL_FILE, sheet_name=0, header=None, engine="calamine")
+    except ImportError:
+        df = pd.read_excel(
+            EXCEL_FILE,
+            sheet_name=0,
+            header=None,
+            engine="openpyxl",
+            engine_kwargs={"read_only": True, "data_only": True, "keep_links": False},
+        )
     df = df.fillna("")
-    return df
-
-timetable_df = load_timetable()
+    # Date, day and the four slot columns as plain object rows
+    return df.iloc[:, :7].to_numpy(dtype=object)
 
 # ───────────────────────── SCHEDULE LOGIC ─────────────────────────
 
-def get_schedule_by_date(target_date, section):
-    df = timetable_df
-
-    # Match exact date in column 1
-    row = df[df[1] == pd.Timestamp(target_date.date())]
-
-    if row.empty:
-        return None, None
+SECTIONS = "123456"
+SECTION_LABELS = {section: f"Section S{section}" for section in SECTIONS}
+DAY_OFFSETS = {"today": 0, "tomorrow": 1}
 
-    row = row.iloc[0]
-    day_name = row[2]
+def build_schedule(rows):
+    # (date, section) -> (heading, slot lines), built once at startup
+    schedule = {}
 
-    slots = [row[3], row[4], row[5], row[6]]
-
-    result = []
-
-    for idx, slot in enumerate(slots, 1):
-        if not slot:
-            result.append(f"Slot {idx}: Free")
+    for row in rows:
+        if not isinstance(row[1], datetime):
             continue
 
-        subjects = []
-        entries = str(slot).split("/")
-
-        for entry in entries:
-            entry = entry.strip()
-            if f"S{section}" in entry:
-                subject = entry.split("(")[0]
-                subjects.append(subject)
-
-        if subjects:
-            result.append(f"Slot {idx}: {' / '.join(subjects)}")
-        else:
-            result.append(f"Slot {idx}: Free")
-
-    return day_name, result
+        day = row[1].date()
+        # Dates never change, so format the reply heading once here
+        heading = f"{row[1]:%d %B %Y} – {row[2]}"
+        by_section = {section: ([], [], [], []) for section in SECTIONS}
+
+        for idx, slot in enumerate(row[3:7]):
+            if not slot:
+                continue
+
+            for subject, section in ENTRY_RE.findall(str(slot)):
+                by_section[section][idx].append(subject)
+
+        for section, slots in by_section.items():
+            lines = tuple(
+                f"Slot {idx}: {' / '.join(subjects) if subjects else 'Free'}"
+                for idx, subjects in enumerate(slots, 1)
+            )
+            schedule[(day, section)] = (heading, lines)
+
+    return schedule
+
+# Cached rather than load_timetable() so the pickle only holds dates and strings
+# and warm starts skip build_schedule too.
+@disk_cached
+def load_schedule():
+    return build_schedule(load_timetable())
+
+async def load_in_background(app):
+    try:
+        return await asyncio.to_thread(load_schedule)
+    except Exception:
+        # A failed load must still take the bot down visibly, as it did on import
+        print("Failed to load timetable, stopping bot:")
+        traceback.print_exc()
+        # stop_running() is ignored until run_webhook has finished starting up
+        while not app.running:
+            await asyncio.sleep(0.1)
+        app.stop_running()
+        raise
+
+async def post_init(app):
+    # Parse the timetable in a worker thread instead of at import time, so it
+    # overlaps with webhook setup. Handlers await the task (instant once done).
+    app.bot_data["timetable"] = asyncio.create_task(load_in_background(app))
+
+def get_schedule_by_date(timetable, target_date, section):
+    return timetable.get((target_date, section), (None, None))
+
+# ───────────────────────── REPLIES ─────────────────────────
+
+def reply(update: Update, context: ContextTypes.DEFAULT_TYPE, text):
+    # Terminal replies are sent as a background task so the handler returns
+    # without waiting on the Telegram round-trip. The application keeps a
+    # reference to the task and routes any failure to its error handlers/log.
+    context.application.create_task(
+        update.message.reply_text(text), update=update
+    )
 
 # ───────────────────────── COMMANDS ─────────────────────────
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text(
+    reply(
+        update,
+        context,
         "Timetable Bot\n\n"
         "Use:\n"
         "today s3\n"
@@ -78,7 +170,9 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text(
+    reply(
+        update,
+        context,
         "Format:\n"
         "today s1\n"
         "tomorrow s4\n\n"
@@ -87,50 +181,49 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 # ───────────────────────── MESSAGE HANDLER ─────────────────────────
 
-async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    text = update.message.text.lower().strip()
+def parse_error(text):
+    # Only reached when MESSAGE_RE rejects the text; works out which part is wrong
     words = text.split()
 
     if len(words) != 2:
-        await update.message.reply_text("Use format: today s3 or tomorrow s2")
-        return
+        return "Use format: today s3 or tomorrow s2"
 
-    day_keyword, section_text = words
+    if words[0] not in DAY_OFFSETS:
+        return "Use 'today' or 'tomorrow'"
 
-    if day_keyword not in ["today", "tomorrow"]:
-        await update.message.reply_text("Use 'today' or 'tomorrow'")
-        return
+    return "Invalid section. Use s1–s6"
 
-    match = re.search(r"s(\d)", section_text)
+async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = update.message.text.lower().strip()
+
+    match = MESSAGE_RE.fullmatch(text)
     if not match:
-        await update.message.reply_text("Invalid section. Use s1–s6")
+        reply(update, context, parse_error(text))
         return
 
-    section = match.group(1)
+    day_keyword, section = match.groups()
 
-    if day_keyword == "today":
-        target_date = datetime.today()
-    else:
-        target_date = datetime.today() + timedelta(days=1)
+    target_date = date.today() + timedelta(days=DAY_OFFSETS[day_keyword])
 
-    day_name, schedule = get_schedule_by_date(target_date, section)
+    try:
+        timetable = await context.bot_data["timetable"]
+    except Exception:
+        reply(update, context, "Timetable unavailable. Please try again later.")
+        return
+    heading, schedule = get_schedule_by_date(timetable, target_date, section)
 
     if not schedule:
-        await update.message.reply_text("No timetable found for that date.")
+        reply(update, context, "No timetable found for that date.")
         return
 
-    response = (
-        f"{target_date.strftime('%d %B %Y')} – {day_name}\n"
-        f"Section S{section}\n\n"
-        + "\n".join(schedule)
-    )
+    response = "\n".join((heading, SECTION_LABELS[section], "", *schedule))
 
-    await update.message.reply_text(response)
+    reply(update, context, response)
 
 # ───────────────────────── MAIN (WEBHOOK FOR RENDER) ─────────────────────────
 
 def main():
-    app = ApplicationBuilder().token(TOKEN).build()
+    app = ApplicationBuilder().token(TOKEN).post_init(post_init).build()
 
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("help", help_command))